@@ -1,13 +1,41 @@
+import io
 import os
+import re
+import shlex
+import shutil
 import subprocess
 import sys
+import threading
 
+from lxml import etree
 from PIL import Image as PILImage
 from ppadb.client import Client as AdbClient
 
+# Matches uiautomator bounds of the form "[x1,y1][x2,y2]"
+_BOUNDS_RE = re.compile(r"\[(\d+),(\d+)\]\[(\d+),(\d+)\]")
+
+# Intent action lines in the Activity Resolver Table
+_ACTION_RE = re.compile(r"^\s*(?:android|com)\.")
+
+# Clickable nodes that have either text or content description
+_CLICKABLE_XPATH = etree.XPath(
+    "//node[@clickable='true' and (string(@text) or string(@content-desc))]"
+)
+
+# Echoed after every command sent to the persistent shell to mark the end of its output
+_SHELL_SENTINEL = b"__ADB_MCP_END__"
+
+# Seconds a command may run on the persistent shell before the session is killed
+_SHELL_TIMEOUT = 120
+
 
 class AdbDeviceManager:
-    def __init__(self, device_name: str | None = None, exit_on_error: bool = True) -> None:
+    def __init__(
+        self,
+        device_name: str | None = None,
+        exit_on_error: bool = True,
+        high_quality_screenshots: bool = False,
+    ) -> None:
         """
         Initialize the ADB Device Manager
 
@@ -15,6 +43,8 @@ class AdbDeviceManager:
             device_name: Optional name/serial of the device to manage.
                          If None, attempts to auto-select if only one device is available.
             exit_on_error: Whether to exit the program if device initialization fails
+            high_quality_screenshots: Downscale screenshots with Lanczos instead of
+                                      the much faster bilinear filter
         """
         if not self.check_adb_installed():
             error_msg = "adb is not installed or not in PATH. Please install adb and ensure it is in your PATH."
@@ -59,58 +89,204 @@ class AdbDeviceManager:
             # If len(available_devices) == 0, it's already caught by the earlier check
 
         # At this point, selected_device_name should always be set due to the logic above
-        # Initialize the device
-        self.device = AdbClient().device(selected_device_name)
+        # All device commands go through the adb executable, so no ppadb
+        # device handle is opened for it
+        self.serial = selected_device_name
+        # adb path and serial prefix for commands run through the adb executable
+        self._adb_cmd = [shutil.which("adb") or "adb", "-s", selected_device_name]
+        self.high_quality_screenshots = high_quality_screenshots
+
+        # Long-lived `adb shell` session shared by all shell commands, started on first use
+        self._shell: subprocess.Popen | None = None
+        self._shell_lock = threading.Lock()
+
+        # None until packages.xml is first stat'ed, False once that failed
+        # (e.g. SELinux hides it from the shell user) so it isn't retried
+        self._packages_stat_ok: bool | None = None
+        # (packages.xml mtime, formatted `pm list packages` output)
+        self._pkg_cache: tuple[str, str] | None = None
+        # package name -> (packages.xml mtime, Non-Data actions)
+        self._intents_cache: dict[str, tuple[str, tuple[str, ...]]] = {}
+
+    def __del__(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Terminate the persistent adb shell session, if one was started."""
+        shell = getattr(self, "_shell", None)
+        if shell is None:
+            return
+        self._shell = None
+        shell.stdin.close()
+        try:
+            shell.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            shell.kill()
+        shell.stdout.close()
+
+    def _start_shell(self) -> subprocess.Popen:
+        shell = subprocess.Popen(
+            [*self._adb_cmd, "shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+        )
+        # Fold stderr into stdout on the device side, as `device.shell` did
+        shell.stdin.write(b"exec 2>&1\n")
+        return shell
+
+    def _run(self, command: str) -> str:
+        """Run a shell command over the persistent adb shell session and return its output."""
+        return self._run_status(command)[0]
+
+    def _run_status(self, command: str) -> tuple[str, int]:
+        """
+        Run a shell command over the persistent adb shell session
+
+        The command is followed by an echo of a sentinel and its exit status,
+        and stdout is read until that line shows up, so each call costs one
+        write and no new adbd session. A command still running after
+        _SHELL_TIMEOUT seconds gets its session killed; the next call starts
+        a fresh one.
+
+        Returns: (output, exit status)
+        """
+        with self._shell_lock:
+            if self._shell is None or self._shell.poll() is not None:
+                self._shell = self._start_shell()
+            shell = self._shell
+
+            # Each command gets its own `sh -c` with stdin closed, so it can't
+            # swallow the sentinel echo, leave a quote open, or carry cd/exit/set
+            # over to the commands after it
+            shell.stdin.write(
+                f"sh -c {shlex.quote(command)} </dev/null\necho ".encode()
+                + _SHELL_SENTINEL + b"$?\n")
+
+            timed_out = threading.Event()
+
+            def expire():
+                timed_out.set()
+                shell.kill()
+
+            # Killing the session makes the read below hit EOF
+            watchdog = threading.Timer(_SHELL_TIMEOUT, expire)
+            watchdog.daemon = True
+            watchdog.start()
+            try:
+                fd = shell.stdout.fileno()
+                output = bytearray()
+                end = -1
+                while True:
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        self.close()
+                        if timed_out.is_set():
+                            raise RuntimeError(
+                                f"adb shell command timed out after {_SHELL_TIMEOUT}s: {command}")
+                        raise RuntimeError(
+                            f"adb shell session for {self.serial} closed unexpectedly")
+                    # Only rescan the tail that could hold a sentinel split across reads
+                    search_from = max(0, len(output) - len(_SHELL_SENTINEL))
+                    output += chunk
+                    if end == -1:
+                        end = output.find(_SHELL_SENTINEL, search_from)
+                    if end != -1:
+                        # The status digits may still be on their way
+                        status_end = output.find(b"\n", end)
+                        if status_end != -1:
+                            status = int(output[end + len(_SHELL_SENTINEL):status_end])
+                            return output[:end].decode("utf-8", errors="replace"), status
+            finally:
+                watchdog.cancel()
 
     @staticmethod
     def check_adb_installed() -> bool:
         """Check if ADB is installed on the system."""
-        try:
-            subprocess.run(["adb", "version"], check=True,
-                           stdout=subprocess.PIPE)
-            return True
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            return False
+        # A PATH lookup instead of forking `adb version`
+        return shutil.which("adb") is not None
 
     @staticmethod
     def get_available_devices() -> list[str]:
         """Get a list of available devices."""
         return [device.serial for device in AdbClient().devices()]
 
+    def _packages_mtime(self) -> str | None:
+        """Modification time of the device package database, or None if it can't be read."""
+        if self._packages_stat_ok is False:
+            return None
+        # %y has nanosecond resolution, so an install within the same second
+        # as the cached listing still changes it
+        mtime, status = self._run_status("stat -c %y /data/system/packages.xml 2>/dev/null")
+        mtime = mtime.strip()
+        self._packages_stat_ok = status == 0 and bool(mtime)
+        return mtime if self._packages_stat_ok else None
+
     def get_packages(self) -> str:
+        # packages.xml is rewritten on every install/uninstall/update, so an
+        # unchanged mtime means the cached listing is still valid
+        mtime = self._packages_mtime()
+        if mtime is not None and self._pkg_cache is not None and self._pkg_cache[0] == mtime:
+            return self._pkg_cache[1]
+
         command = "pm list packages"
-        packages = self.device.shell(command).strip().split("\n")
-        result = [package[8:] for package in packages]
-        output = "\n".join(result)
+        raw, status = self._run_status(command)
+        # Every line is "package:<name>" and ':' can't appear in a package name
+        output = raw.replace("package:", "").strip()
+
+        # pm prints errors while the device is still booting; caching one of
+        # those would keep serving it until the next install
+        listed = status == 0 and all(
+            line.startswith("package:") for line in raw.splitlines() if line.strip())
+        if mtime is not None and listed:
+            self._pkg_cache = (mtime, output)
         return output
 
     def get_package_action_intents(self, package_name: str) -> list[str]:
-        command = f"dumpsys package {package_name}"
-        output = self.device.shell(command)
-
-        resolver_table_start = output.find("Activity Resolver Table:")
-        if resolver_table_start == -1:
-            return []
-        resolver_section = output[resolver_table_start:]
-
-        non_data_start = resolver_section.find("\n  Non-Data Actions:")
-        if non_data_start == -1:
-            return []
-
-        section_end = resolver_section[non_data_start:].find("\n\n")
-        if section_end == -1:
-            non_data_section = resolver_section[non_data_start:]
-        else:
-            non_data_section = resolver_section[
-                non_data_start: non_data_start + section_end
-            ]
+        # A package's resolver table only changes when it is installed,
+        # updated or removed, all of which rewrite packages.xml
+        mtime = self._packages_mtime()
+        cached = self._intents_cache.get(package_name)
+        if mtime is not None and cached is not None and cached[0] == mtime:
+            return list(cached[1])
 
+        # Stream dumpsys (which can be several MB for system apps) and stop
+        # reading as soon as the Non-Data Actions section has ended
         actions = []
-        for line in non_data_section.split("\n"):
-            line = line.strip()
-            if line.startswith("android.") or line.startswith("com."):
-                actions.append(line)
+        with subprocess.Popen(
+            [*self._adb_cmd, "exec-out", "dumpsys", "package", package_name],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+        ) as proc:
+            in_resolver_table = False
+            in_non_data = False
+            for line in proc.stdout:
+                line = line.rstrip("\n")
+                if in_non_data:
+                    if not line:
+                        proc.terminate()
+                        break
+                    if _ACTION_RE.match(line):
+                        actions.append(line.strip())
+                elif in_resolver_table:
+                    in_non_data = line.startswith("  Non-Data Actions:")
+                elif "Activity Resolver Table:" in line:
+                    in_resolver_table = True
+            else:
+                # Read to the end, so a failed adb (e.g. device offline) is
+                # told apart from a package without Non-Data actions
+                if proc.wait() != 0:
+                    raise RuntimeError(
+                        f"dumpsys package {package_name} failed: {proc.stderr.read().strip()}")
 
+        # exec-out exits 0 even when dumpsys fails on the device (e.g. "Can't
+        # find service: package" while booting), so only a dump that reached
+        # the resolver table is known to be complete enough to cache
+        if mtime is not None and in_resolver_table:
+            self._intents_cache[package_name] = (mtime, tuple(actions))
         return actions
 
     def execute_adb_shell_command(self, command: str) -> str:
@@ -119,66 +295,84 @@ class AdbDeviceManager:
             command = command[10:]
         elif command.startswith("adb "):
             command = command[4:]
-        result = self.device.shell(command)
+        result = self._run(command)
         return result
 
-    def take_screenshot(self) -> None:
-        self.device.shell("screencap -p /sdcard/screenshot.png")
-        self.device.pull("/sdcard/screenshot.png", "screenshot.png")
-        self.device.shell("rm /sdcard/screenshot.png")
+    def take_screenshot(self) -> bytes:
+        """Capture the screen and return it as a downscaled JPEG, without touching disk."""
+        # exec-out streams the PNG straight back, with no temp file on the device
+        raw = subprocess.run(
+            [*self._adb_cmd, "exec-out", "screencap", "-p"],
+            capture_output=True,
+            check=True,
+        ).stdout
 
         # compressing the ss to avoid "maximum call stack exceeded" error on claude desktop
-        with PILImage.open("screenshot.png") as img:
+        with PILImage.open(io.BytesIO(raw)) as img:
             width, height = img.size
             new_width = int(width * 0.3)
             new_height = int(height * 0.3)
-            resized_img = img.resize(
-                (new_width, new_height), PILImage.Resampling.LANCZOS
+            # Bilinear is visually indistinguishable at this size and far cheaper than Lanczos
+            resample = (
+                PILImage.Resampling.LANCZOS
+                if self.high_quality_screenshots
+                else PILImage.Resampling.BILINEAR
             )
+            # Integer box reduction is a cheap C fast path; the resize then only
+            # has a small adjustment left to reach the exact target size
+            factor = max(1, min(width // new_width, height // new_height))
+            reduced_img = img.reduce(factor) if factor > 1 else img
+            resized_img = reduced_img.resize((new_width, new_height), resample)
 
-            resized_img.save(
-                "compressed_screenshot.png", "PNG", quality=85, optimize=True
+            # JPEG encodes far faster than optimized PNG and yields a much smaller payload
+            buffer = io.BytesIO()
+            resized_img.convert("RGB").save(
+                buffer, "JPEG", quality=80, optimize=False, progressive=False
             )
+            return buffer.getvalue()
 
     def get_uilayout(self) -> str:
-        self.device.shell("uiautomator dump")
-        self.device.pull("/sdcard/window_dump.xml", "window_dump.xml")
-        self.device.shell("rm /sdcard/window_dump.xml")
-
-        import re
-        import xml.etree.ElementTree as ET
+        # Dumping to /dev/tty through exec-out returns the XML in one round
+        # trip, with no file written to the device or pulled from it
+        output = subprocess.run(
+            [*self._adb_cmd, "exec-out", "uiautomator", "dump", "/dev/tty"],
+            capture_output=True,
+            check=True,
+        ).stdout
+        # Drop the trailing "UI hierchary dumped to: /dev/tty" status line
+        hierarchy_end = output.rfind(b"</hierarchy>")
+        if hierarchy_end == -1:
+            raise RuntimeError(
+                f"uiautomator dump failed: {output.decode('utf-8', errors='replace').strip()}")
+        xml_bytes = output[: hierarchy_end + len(b"</hierarchy>")]
 
         def calculate_center(bounds_str):
-            matches = re.findall(r"\[(\d+),(\d+)\]", bounds_str)
-            if len(matches) == 2:
-                x1, y1 = map(int, matches[0])
-                x2, y2 = map(int, matches[1])
+            match = _BOUNDS_RE.match(bounds_str)
+            if match:
+                x1, y1, x2, y2 = map(int, match.groups())
                 center_x = (x1 + x2) // 2
                 center_y = (y1 + y2) // 2
                 return center_x, center_y
             return None
 
-        tree = ET.parse("window_dump.xml")
-        root = tree.getroot()
+        root = etree.fromstring(xml_bytes)
 
         clickable_elements = []
-        for element in root.findall(".//node[@clickable='true']"):
+        for element in _CLICKABLE_XPATH(root):
             text = element.get("text", "")
             content_desc = element.get("content-desc", "")
             bounds = element.get("bounds", "")
 
-            # Only include elements that have either text or content description
-            if text or content_desc:
-                center = calculate_center(bounds)
-                element_info = "Clickable element:"
-                if text:
-                    element_info += f"\n  Text: {text}"
-                if content_desc:
-                    element_info += f"\n  Description: {content_desc}"
-                element_info += f"\n  Bounds: {bounds}"
-                if center:
-                    element_info += f"\n  Center: ({center[0]}, {center[1]})"
-                clickable_elements.append(element_info)
+            center = calculate_center(bounds)
+            parts = ["Clickable element:"]
+            if text:
+                parts.append(f"  Text: {text}")
+            if content_desc:
+                parts.append(f"  Description: {content_desc}")
+            parts.append(f"  Bounds: {bounds}")
+            if center:
+                parts.append(f"  Center: ({center[0]}, {center[1]})")
+            clickable_elements.append("\n".join(parts))
 
         if not clickable_elements:
             return "No clickable elements found with text or description"
@@ -47,8 +47,8 @@ def main():
         print("Failed to install test dependencies")
         return 1
 
-    # Run tests with coverage
-    if not run_command("pytest tests/ -v --cov=. --cov-report=term-missing", "Running tests with coverage"):
+    # Run tests with coverage, one worker per CPU; test files share no state
+    if not run_command("pytest tests/ -v -n auto --dist=loadfile --cov=. --cov-report=term-missing", "Running tests with coverage"):
         print("Tests failed")
         return 1
 
@@ -10,17 +10,24 @@ from mcp.server.fastmcp import FastMCP, Image
 
 from adbdevicemanager import AdbDeviceManager
 
+try:
+    # libyaml-backed loader; falls back to the pure-Python one if PyYAML was built without it
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 CONFIG_FILE = "config.yaml"
 CONFIG_FILE_EXAMPLE = "config.yaml.example"
 
 # Load config (make config file optional)
 config = {}
 device_name = None
+high_quality_screenshots = False
 
 if os.path.exists(CONFIG_FILE):
     try:
         with open(CONFIG_FILE) as f:
-            config = yaml.safe_load(f.read()) or {}
+            config = yaml.load(f, Loader=SafeLoader) or {}
         device_config = config.get("device", {})
         configured_device_name = device_config.get(
             "name") if device_config else None
@@ -37,6 +44,10 @@ if os.path.exists(CONFIG_FILE):
             print(f"Loaded config from {CONFIG_FILE}")
             print(
                 "No device specified in config, will auto-select if only one device connected")
+
+        screenshot_config = config.get("screenshot") or {}
+        high_quality_screenshots = bool(
+            screenshot_config.get("high_quality", False))
     except Exception as e:
         print(f"Error loading config file {CONFIG_FILE}: {e}", file=sys.stderr)
         print(
@@ -49,7 +60,8 @@ else:
 # Initialize MCP and device manager
 # AdbDeviceManager will handle auto-selection if device_name is None
 mcp = FastMCP("android")
-deviceManager = AdbDeviceManager(device_name)
+deviceManager = AdbDeviceManager(
+    device_name, high_quality_screenshots=high_quality_screenshots)
 
 # Configure paths to avoid nesting
 mcp.settings.streamable_http_path = "/"
@@ -106,8 +118,7 @@ def get_screenshot() -> Image:
     Returns:
         Image: the screenshot
     """
-    deviceManager.take_screenshot()
-    return Image(path="compressed_screenshot.png")
+    return Image(data=deviceManager.take_screenshot(), format="jpeg")
 
 
 @mcp.tool()
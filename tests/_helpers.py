@@ -0,0 +1,70 @@
+"""
+Helpers shared across the test modules
+"""
+
+import contextlib
+import copy
+import functools
+import os
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_cached(content):
+    """Parse config YAML, memoized by content since tests reuse the same configs"""
+    # Imported here so tests that never read a config file don't load PyYAML
+    import yaml
+
+    # CSafeLoader only exists when PyYAML was built with libyaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(content, Loader=loader) or {}
+
+
+def _parse(content):
+    """Parse config YAML, handing each caller its own copy of the memoized result"""
+    return copy.deepcopy(_parse_cached(content))
+
+
+def load_config_logic(config_source):
+    """
+    Simulate the config loading logic from server.py
+
+    config_source is either a config file path or a file-like object
+    (e.g. io.StringIO) holding the config contents.
+    Returns: (device_name, messages)
+    """
+    messages = []
+    device_name = None
+
+    is_stream = hasattr(config_source, "read")
+    config_file_path = getattr(config_source, "name", "<stream>") if is_stream else config_source
+
+    if is_stream or os.path.exists(config_file_path):
+        try:
+            with contextlib.nullcontext(config_source) if is_stream else open(config_file_path) as f:
+                config = _parse(f.read())
+            device_config = config.get("device", {})
+            configured_device_name = device_config.get(
+                "name") if device_config else None
+
+            if configured_device_name and configured_device_name.strip():
+                device_name = configured_device_name.strip()
+                messages.append(f"Loaded config from {config_file_path}")
+                messages.append(f"Configured device: {device_name}")
+            else:
+                messages.append(f"Loaded config from {config_file_path}")
+                messages.append(
+                    "No device specified in config, will auto-select if only one device connected")
+        except Exception as e:
+            messages.append(
+                f"Error loading config file {config_file_path}: {e}")
+            raise
+    else:
+        messages.append(
+            f"Config file {config_file_path} not found, using auto-selection for device")
+
+    return device_name, messages
+
+
+def assert_msg(messages, needle):
+    """Assert that needle appears in one of the collected messages"""
+    assert needle in "\n".join(messages)
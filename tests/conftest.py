@@ -0,0 +1,43 @@
+"""
+Shared pytest fixtures
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+# Keep pytest's detailed assertion output for the shared assert helpers
+pytest.register_assert_rewrite("tests._helpers")
+
+from tests._helpers import load_config_logic  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def load_config():
+    """Config loading logic from server.py, resolved once per session"""
+    return load_config_logic
+
+
+@pytest.fixture
+def mock_adb_client(monkeypatch):
+    """MagicMock standing in for ppadb's AdbClient class inside adbdevicemanager"""
+    client = MagicMock()
+    monkeypatch.setattr("adbdevicemanager.AdbClient", client)
+    return client
+
+
+@pytest.fixture
+def adb_devices():
+    """Serials reported as connected under adb_env; override with pytest.mark.parametrize"""
+    return ["device123"]
+
+
+@pytest.fixture
+def adb_env(monkeypatch, mock_adb_client, adb_devices):
+    """Patch adb discovery so AdbDeviceManager sees adb installed and adb_devices connected"""
+    monkeypatch.setattr(
+        "adbdevicemanager.AdbDeviceManager.check_adb_installed", staticmethod(lambda: True))
+    monkeypatch.setattr(
+        "adbdevicemanager.AdbDeviceManager.get_available_devices", staticmethod(lambda: adb_devices))
+    return mock_adb_client
+
@@ -2,111 +2,65 @@
 Tests for AdbDeviceManager
 """
 
+import io
 import os
-import sys
-from unittest.mock import MagicMock, patch
+import shutil
+from types import SimpleNamespace
+from unittest.mock import patch
 
 import pytest
+from PIL import Image as PILImage
 
-from adbdevicemanager import AdbDeviceManager
-
-# Add the parent directory to the path so we can import our modules
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import adbdevicemanager
+from adbdevicemanager import _SHELL_SENTINEL, AdbDeviceManager
 
 
 class TestAdbDeviceManager:
     """Test AdbDeviceManager functionality"""
 
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    @patch('adbdevicemanager.AdbClient')
-    def test_single_device_auto_selection(self, mock_adb_client, mock_get_devices, mock_check_adb):
+    def test_single_device_auto_selection(self, adb_env, capsys):
         """Test auto-selection when only one device is connected"""
-        # Setup mocks
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = ["device123"]
-        mock_device = MagicMock()
-        mock_adb_client.return_value.device.return_value = mock_device
-
         # Test with device_name=None (auto-selection)
-        with patch('builtins.print') as mock_print:
-            manager = AdbDeviceManager(device_name=None, exit_on_error=False)
+        manager = AdbDeviceManager(device_name=None, exit_on_error=False)
 
-            # Verify the correct device was selected
-            mock_adb_client.return_value.device.assert_called_once_with(
-                "device123")
-            assert manager.device == mock_device
+        # Verify the correct device was selected
+        assert manager.serial == "device123"
 
-            # Verify auto-selection message was printed
-            mock_print.assert_called_with(
-                "No device specified, automatically selected: device123")
+        # Verify auto-selection message was printed
+        assert "No device specified, automatically selected: device123" in capsys.readouterr().out
 
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    def test_multiple_devices_no_selection_error(self, mock_get_devices, mock_check_adb):
+    @pytest.mark.parametrize("adb_devices", [["device123", "device456"]])
+    def test_multiple_devices_no_selection_error(self, adb_env):
         """Test error when multiple devices are connected but none specified"""
-        # Setup mocks
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = ["device123", "device456"]
-
         # Test with device_name=None and multiple devices
-        with pytest.raises(RuntimeError) as exc_info:
+        with pytest.raises(RuntimeError, match=r"Multiple devices connected: \['device123', 'device456'\]"):
             AdbDeviceManager(device_name=None, exit_on_error=False)
 
-        assert "Multiple devices connected" in str(exc_info.value)
-        assert "device123" in str(exc_info.value)
-        assert "device456" in str(exc_info.value)
-
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    @patch('adbdevicemanager.AdbClient')
-    def test_specific_device_selection(self, mock_adb_client, mock_get_devices, mock_check_adb):
+    @pytest.mark.parametrize("adb_devices", [["device123", "device456"]])
+    def test_specific_device_selection(self, adb_env):
         """Test selecting a specific device"""
-        # Setup mocks
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = ["device123", "device456"]
-        mock_device = MagicMock()
-        mock_adb_client.return_value.device.return_value = mock_device
-
         # Test with specific device name
         manager = AdbDeviceManager(
             device_name="device456", exit_on_error=False)
 
         # Verify the correct device was selected
-        mock_adb_client.return_value.device.assert_called_once_with(
-            "device456")
-        assert manager.device == mock_device
+        assert manager.serial == "device456"
 
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    def test_device_not_found_error(self, mock_get_devices, mock_check_adb):
+    @pytest.mark.parametrize("adb_devices", [["device123", "device456"]])
+    def test_device_not_found_error(self, adb_env):
         """Test error when specified device is not found"""
-        # Setup mocks
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = ["device123", "device456"]
-
         # Test with non-existent device
-        with pytest.raises(RuntimeError) as exc_info:
+        with pytest.raises(RuntimeError, match=r"Device non-existent-device not found\. Available devices"):
             AdbDeviceManager(device_name="non-existent-device",
                              exit_on_error=False)
 
-        assert "Device non-existent-device not found" in str(exc_info.value)
-        assert "Available devices" in str(exc_info.value)
-
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    def test_no_devices_connected_error(self, mock_get_devices, mock_check_adb):
+    @pytest.mark.parametrize("adb_devices", [[]])
+    def test_no_devices_connected_error(self, adb_env):
         """Test error when no devices are connected"""
-        # Setup mocks
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = []
-
         # Test with no devices
-        with pytest.raises(RuntimeError) as exc_info:
+        with pytest.raises(RuntimeError, match="No devices connected"):
             AdbDeviceManager(device_name=None, exit_on_error=False)
 
-        assert "No devices connected" in str(exc_info.value)
-
     @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
     def test_adb_not_installed_error(self, mock_check_adb):
         """Test error when ADB is not installed"""
@@ -114,38 +68,33 @@ class TestAdbDeviceManager:
         mock_check_adb.return_value = False
 
         # Test with ADB not installed
-        with pytest.raises(RuntimeError) as exc_info:
+        with pytest.raises(RuntimeError, match="adb is not installed"):
             AdbDeviceManager(device_name=None, exit_on_error=False)
 
-        assert "adb is not installed" in str(exc_info.value)
-
-    @patch('subprocess.run')
-    def test_check_adb_installed_success(self, mock_run):
+    @patch('shutil.which')
+    def test_check_adb_installed_success(self, mock_which):
         """Test successful ADB installation check"""
-        mock_run.return_value = MagicMock()  # Successful run
+        mock_which.return_value = "/usr/bin/adb"  # Found on PATH
 
         result = AdbDeviceManager.check_adb_installed()
 
         assert result is True
-        mock_run.assert_called_once()
+        mock_which.assert_called_once_with("adb")
 
-    @patch('subprocess.run')
-    def test_check_adb_installed_failure(self, mock_run):
+    @patch('shutil.which')
+    def test_check_adb_installed_failure(self, mock_which):
         """Test failed ADB installation check"""
-        mock_run.side_effect = FileNotFoundError()  # ADB not found
+        mock_which.return_value = None  # ADB not found
 
         result = AdbDeviceManager.check_adb_installed()
 
         assert result is False
 
-    @patch('adbdevicemanager.AdbClient')
     def test_get_available_devices(self, mock_adb_client):
         """Test getting available devices"""
         # Setup mock devices
-        mock_device1 = MagicMock()
-        mock_device1.serial = "device123"
-        mock_device2 = MagicMock()
-        mock_device2.serial = "device456"
+        mock_device1 = SimpleNamespace(serial="device123")
+        mock_device2 = SimpleNamespace(serial="device456")
 
         mock_adb_client.return_value.devices.return_value = [
             mock_device1, mock_device2]
@@ -154,18 +103,457 @@ class TestAdbDeviceManager:
 
         assert devices == ["device123", "device456"]
 
-    @patch('adbdevicemanager.AdbDeviceManager.check_adb_installed')
-    @patch('adbdevicemanager.AdbDeviceManager.get_available_devices')
-    @patch('adbdevicemanager.AdbClient')
-    def test_exit_on_error_true(self, mock_adb_client, mock_get_devices, mock_check_adb):
+    @pytest.mark.parametrize("adb_devices", [[]])
+    def test_exit_on_error_true(self, adb_env):
         """Test that exit_on_error=True calls sys.exit"""
-        # Setup mocks to trigger error
-        mock_check_adb.return_value = True
-        mock_get_devices.return_value = []  # No devices
-
         # Test with exit_on_error=True (default)
         with patch('sys.exit') as mock_exit:
-            with patch('builtins.print'):  # Suppress error output
-                AdbDeviceManager(device_name=None, exit_on_error=True)
+            AdbDeviceManager(device_name=None, exit_on_error=True)
 
             mock_exit.assert_called_once_with(1)
+
+
+@pytest.fixture
+def manager(adb_env):
+    """AdbDeviceManager for the single device123 from adb_env"""
+    manager = AdbDeviceManager(device_name=None, exit_on_error=False)
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def local_shell(manager, monkeypatch, tmp_path):
+    """Run the persistent shell session on a local sh instead of `adb shell`"""
+    if shutil.which("sh") is None:
+        pytest.skip("needs a POSIX sh")
+    monkeypatch.chdir(tmp_path)
+    # `adb -s <serial> shell` becomes `sh -c "exec sh" sh shell`
+    manager._adb_cmd = ["sh", "-c", "exec sh", "sh"]
+    return manager
+
+
+class FakeShell:
+    """Stands in for the shell Popen, replaying canned stdout bytes"""
+
+    def __init__(self, stdout_data):
+        self.stdin = io.BytesIO()
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, stdout_data)
+        os.close(write_fd)
+        self.stdout = os.fdopen(read_fd, "rb")
+
+    def poll(self):
+        return None
+
+    def wait(self, timeout=None):
+        return 0
+
+    def kill(self):
+        pass
+
+
+class ScriptedShell:
+    """
+    Stands in for _run_status, answering by command prefix and recording every command
+
+    A response is either the output, for a command exiting 0, or (output, exit status).
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        response = next(response for prefix, response in self.responses.items()
+                        if command.startswith(prefix))
+        return response if isinstance(response, tuple) else (response, 0)
+
+    def count(self, prefix):
+        return sum(command.startswith(prefix) for command in self.commands)
+
+
+class FakePopen:
+    """Stands in for subprocess.Popen, replaying canned stdout, stderr and exit status"""
+
+    def __init__(self, stdout="", stderr="", returncode=0):
+        self.stdout = io.StringIO(stdout)
+        self.stderr = io.StringIO(stderr)
+        self.returncode = returncode
+        self.terminated = False
+
+    def __call__(self, args, **kwargs):
+        self.args = args
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def terminate(self):
+        self.terminated = True
+
+
+# Trimmed `dumpsys package` output; the Receiver table's actions must not be picked up
+DUMPSYS_PACKAGE = """\
+Activity Resolver Table:
+  Full MIME Types:
+      text/plain:
+        1f2e3d4 com.example/.ShareActivity filter 5a6b7c8
+
+  Non-Data Actions:
+      android.intent.action.MAIN:
+        1f2e3d4 com.example/.MainActivity filter 9d8e7f6
+          Action: "android.intent.action.MAIN"
+      com.example.action.SYNC:
+        1f2e3d4 com.example/.SyncActivity filter 0a1b2c3
+      org.example.action.IGNORED:
+        1f2e3d4 com.example/.OtherActivity filter 4d5e6f7
+
+Receiver Resolver Table:
+  Non-Data Actions:
+      android.intent.action.BOOT_COMPLETED:
+        2a3b4c5 com.example/.BootReceiver filter 6d7e8f9
+
+Packages:
+  Package [com.example] (1f2e3d4):
+"""
+
+
+# `uiautomator dump /dev/tty` output, status line included
+UI_DUMP = (
+    b"<?xml version='1.0' encoding='UTF-8' standalone='yes' ?>"
+    b'<hierarchy rotation="0">'
+    b'<node index="0" text="" content-desc="" clickable="false" bounds="[0,0][1080,2400]">'
+    b'<node index="0" text="OK" content-desc="" clickable="true" bounds="[100,200][300,400]" />'
+    b'<node index="1" text="" content-desc="Back" clickable="true" bounds="[0,0][50,51]" />'
+    b'<node index="2" text="Both" content-desc="Both desc" clickable="true" bounds="bogus" />'
+    b'<node index="3" text="" content-desc="" clickable="true" bounds="[1,1][2,2]" />'
+    b'<node index="4" text="Label" content-desc="" clickable="false" bounds="[0,0][10,10]" />'
+    b"</node>"
+    b"</hierarchy>"
+    b"UI hierchary dumped to: /dev/tty\n"
+)
+
+
+def fake_run(stdout):
+    """Stands in for subprocess.run, returning stdout and recording the command"""
+    def run(args, **kwargs):
+        run.args = args
+        return SimpleNamespace(stdout=stdout, returncode=0)
+    return run
+
+
+class TestShellSession:
+    """Test command framing and isolation on the persistent adb shell"""
+
+    def test_output_framed_by_sentinel(self, manager, monkeypatch):
+        """Test output is returned up to the sentinel and the command is wrapped in sh -c"""
+        shell = FakeShell(b"line one\nline two\n" + _SHELL_SENTINEL + b"2\n")
+        monkeypatch.setattr(manager, "_start_shell", lambda: shell)
+
+        assert manager._run_status("ls -l '/sdcard'") == ("line one\nline two\n", 2)
+        assert shell.stdin.getvalue() == (
+            b"sh -c 'ls -l '\"'\"'/sdcard'\"'\"'' </dev/null\necho " + _SHELL_SENTINEL + b"$?\n")
+
+    def test_sentinel_split_across_reads(self, manager, monkeypatch):
+        """Test a sentinel and status arriving over several reads are still found"""
+        shell = FakeShell(b"hello\n" + _SHELL_SENTINEL + b"127\n")
+        monkeypatch.setattr(manager, "_start_shell", lambda: shell)
+        # Hand back 4 bytes per read so the sentinel straddles chunks
+        monkeypatch.setattr(adbdevicemanager, "os", SimpleNamespace(
+            read=lambda fd, n: os.read(fd, 4)))
+
+        assert manager._run_status("echo hello") == ("hello\n", 127)
+
+    def test_session_reused(self, local_shell):
+        """Test consecutive commands share one shell session"""
+        assert local_shell._run("echo one") == "one\n"
+        session = local_shell._shell
+        assert local_shell._run("echo two") == "two\n"
+        assert local_shell._shell is session
+
+    @pytest.mark.parametrize("command, status", [
+        pytest.param("true", 0, id="success"),
+        pytest.param("false", 1, id="failure"),
+        pytest.param("exit 3", 3, id="exit"),
+    ])
+    def test_exit_status_reported(self, local_shell, command, status):
+        """Test the command's exit status comes back with its output"""
+        assert local_shell._run_status(command) == ("", status)
+
+    @pytest.mark.parametrize("command", [
+        pytest.param("cat", id="reads-stdin"),
+        pytest.param("echo 'unterminated", id="open-quote"),
+        pytest.param("exit 3", id="exit"),
+        pytest.param("set -e; false", id="set-e"),
+        pytest.param("cd /", id="cd"),
+    ])
+    def test_commands_isolated(self, local_shell, tmp_path, command):
+        """Test a command can't hang the session or leak state into the next one"""
+        local_shell._run(command)
+        session = local_shell._shell
+
+        assert os.path.samefile(local_shell._run("pwd").strip(), tmp_path)
+        assert local_shell._shell is session
+
+    def test_closed_session_restarted(self, local_shell):
+        """Test a session that died is replaced on the next command"""
+        local_shell._run("true")
+        session = local_shell._shell
+        session.kill()
+        session.wait()
+
+        assert local_shell._run("echo back") == "back\n"
+        assert local_shell._shell is not session
+
+    def test_timeout_kills_and_restarts_session(self, local_shell, monkeypatch):
+        """Test a hung command raises and leaves a working session behind"""
+        monkeypatch.setattr(adbdevicemanager, "_SHELL_TIMEOUT", 0.2)
+
+        # Point the command's output away from the pipe, so that like on a
+        # device only the killed session holds it open
+        with pytest.raises(RuntimeError, match="timed out after 0.2s"):
+            local_shell._run("exec >/dev/null 2>&1; sleep 5")
+        assert local_shell._shell is None
+
+        assert local_shell._run("echo back") == "back\n"
+
+
+class TestPackageCache:
+    """Test get_packages caching on the packages.xml mtime"""
+
+    @pytest.fixture
+    def shell(self, manager, monkeypatch):
+        shell = ScriptedShell({
+            "stat": "2025-01-01 12:00:00.123456789 +0000\n",
+            "pm list packages": "package:com.example.one\npackage:com.example.two\n",
+        })
+        monkeypatch.setattr(manager, "_run_status", shell)
+        return shell
+
+    def test_cache_hit_while_mtime_unchanged(self, manager, shell):
+        """Test pm runs once while packages.xml is unchanged"""
+        assert manager.get_packages() == "com.example.one\ncom.example.two"
+        assert manager.get_packages() == "com.example.one\ncom.example.two"
+
+        assert shell.count("pm") == 1
+        assert shell.count("stat") == 2
+
+    def test_cache_miss_after_mtime_change(self, manager, shell):
+        """Test a sub-second mtime change refetches the package list"""
+        manager.get_packages()
+        shell.responses["stat"] = "2025-01-01 12:00:00.987654321 +0000\n"
+        shell.responses["pm list packages"] = "package:com.example.three\n"
+
+        assert manager.get_packages() == "com.example.three"
+        assert shell.count("pm") == 2
+
+    def test_no_cache_when_stat_denied(self, manager, shell):
+        """Test a failed stat is not retried and nothing is cached"""
+        shell.responses["stat"] = ""
+
+        manager.get_packages()
+        manager.get_packages()
+
+        assert shell.count("stat") == 1
+        assert shell.count("pm") == 2
+
+    @pytest.mark.parametrize("status", [0, 1])
+    def test_pm_error_not_cached(self, manager, shell, status):
+        """Test a pm error while the device boots is retried on the next call"""
+        error = "Error: Could not access the Package Manager. Is the system running?\n"
+        shell.responses["pm list packages"] = (error, status)
+
+        assert manager.get_packages() == error.strip()
+
+        shell.responses["pm list packages"] = "package:com.example.one\n"
+        assert manager.get_packages() == "com.example.one"
+        assert manager.get_packages() == "com.example.one"
+        assert shell.count("pm") == 2
+
+
+class TestPackageActionIntents:
+    """Test get_package_action_intents parsing of streamed dumpsys output"""
+
+    @pytest.fixture(autouse=True)
+    def shell(self, manager, monkeypatch):
+        # stat denied, so nothing is cached between calls
+        shell = ScriptedShell({"stat": ""})
+        monkeypatch.setattr(manager, "_run_status", shell)
+        return shell
+
+    @pytest.mark.parametrize("dumpsys, expected", [
+        pytest.param(DUMPSYS_PACKAGE,
+                     ["android.intent.action.MAIN:", "com.example.action.SYNC:"],
+                     id="activity-table-only"),
+        pytest.param(DUMPSYS_PACKAGE.split("\nReceiver")[0].rstrip("\n") + "\n",
+                     ["android.intent.action.MAIN:", "com.example.action.SYNC:"],
+                     id="section-ends-at-eof"),
+        pytest.param(DUMPSYS_PACKAGE.replace("Activity Resolver Table:", "Service Resolver Table:"),
+                     [], id="no-activity-table"),
+        pytest.param("Activity Resolver Table:\n  Full MIME Types:\n\nPackages:\n",
+                     [], id="no-non-data-section"),
+    ])
+    def test_parses_non_data_actions(self, manager, monkeypatch, dumpsys, expected):
+        """Test the streamed parser matches the former whole-output slicing"""
+        popen = FakePopen(stdout=dumpsys)
+        monkeypatch.setattr("subprocess.Popen", popen)
+
+        assert manager.get_package_action_intents("com.example") == expected
+        # args[0] is wherever adb resolves on PATH
+        assert popen.args[1:] == ["-s", "device123", "exec-out",
+                                  "dumpsys", "package", "com.example"]
+
+    def test_stops_reading_after_section(self, manager, monkeypatch):
+        """Test dumpsys is terminated once the Non-Data Actions section ends"""
+        popen = FakePopen(stdout=DUMPSYS_PACKAGE)
+        monkeypatch.setattr("subprocess.Popen", popen)
+
+        manager.get_package_action_intents("com.example")
+
+        assert popen.terminated
+        assert "Receiver Resolver Table:" in popen.stdout.read()
+
+    def test_adb_failure_raises(self, manager, monkeypatch):
+        """Test a failing adb raises instead of returning no actions"""
+        monkeypatch.setattr("subprocess.Popen", FakePopen(
+            stderr="error: device offline\n", returncode=1))
+
+        with pytest.raises(RuntimeError, match="dumpsys package com.example failed: error: device offline"):
+            manager.get_package_action_intents("com.example")
+
+
+class TestPackageActionIntentsCache:
+    """Test get_package_action_intents caching on the packages.xml mtime"""
+
+    @pytest.fixture
+    def shell(self, manager, monkeypatch):
+        shell = ScriptedShell({"stat": "2025-01-01 12:00:00.123456789 +0000\n"})
+        monkeypatch.setattr(manager, "_run_status", shell)
+        return shell
+
+    @pytest.fixture
+    def dumpsys_calls(self, monkeypatch):
+        """Number of dumpsys processes started, each replaying DUMPSYS_PACKAGE"""
+        calls = []
+
+        def popen(args, **kwargs):
+            calls.append(args)
+            return FakePopen(stdout=DUMPSYS_PACKAGE)
+        monkeypatch.setattr("subprocess.Popen", popen)
+        return calls
+
+    def test_cache_hit_while_mtime_unchanged(self, manager, shell, dumpsys_calls):
+        """Test dumpsys runs once per package while packages.xml is unchanged"""
+        first = manager.get_package_action_intents("com.example")
+        first.append("caller mutation")
+
+        assert manager.get_package_action_intents("com.example") == [
+            "android.intent.action.MAIN:", "com.example.action.SYNC:"]
+        assert len(dumpsys_calls) == 1
+
+        manager.get_package_action_intents("com.example.other")
+        assert len(dumpsys_calls) == 2
+
+    def test_cache_miss_after_mtime_change(self, manager, shell, dumpsys_calls):
+        """Test a changed packages.xml mtime reruns dumpsys"""
+        manager.get_package_action_intents("com.example")
+        shell.responses["stat"] = "2025-01-01 12:00:00.987654321 +0000\n"
+
+        manager.get_package_action_intents("com.example")
+        assert len(dumpsys_calls) == 2
+
+    def test_no_cache_when_stat_denied(self, manager, shell, dumpsys_calls):
+        """Test a failed stat is not retried and dumpsys runs every time"""
+        shell.responses["stat"] = ""
+
+        manager.get_package_action_intents("com.example")
+        manager.get_package_action_intents("com.example")
+
+        assert shell.count("stat") == 1
+        assert len(dumpsys_calls) == 2
+
+    def test_failure_not_cached(self, manager, shell, monkeypatch):
+        """Test a failed dumpsys leaves nothing cached"""
+        monkeypatch.setattr("subprocess.Popen", FakePopen(returncode=1))
+        with pytest.raises(RuntimeError):
+            manager.get_package_action_intents("com.example")
+
+        assert manager._intents_cache == {}
+
+    def test_device_side_failure_not_cached(self, manager, shell, monkeypatch):
+        """Test a dump without a resolver table is retried on the next call"""
+        monkeypatch.setattr("subprocess.Popen", FakePopen(stdout="Can't find service: package\n"))
+        assert manager.get_package_action_intents("com.example") == []
+        assert manager._intents_cache == {}
+
+        monkeypatch.setattr("subprocess.Popen", FakePopen(stdout=DUMPSYS_PACKAGE))
+        assert manager.get_package_action_intents("com.example") == [
+            "android.intent.action.MAIN:", "com.example.action.SYNC:"]
+
+
+class TestUiLayout:
+    """Test get_uilayout parsing of the UI hierarchy dump"""
+
+    def test_lists_clickable_elements_with_text(self, manager, monkeypatch):
+        """Test only clickable nodes with text or description are listed, malformed bounds without a center"""
+        run = fake_run(UI_DUMP)
+        monkeypatch.setattr("subprocess.run", run)
+
+        assert manager.get_uilayout() == (
+            "Clickable element:\n"
+            "  Text: OK\n"
+            "  Bounds: [100,200][300,400]\n"
+            "  Center: (200, 300)\n"
+            "\n"
+            "Clickable element:\n"
+            "  Description: Back\n"
+            "  Bounds: [0,0][50,51]\n"
+            "  Center: (25, 25)\n"
+            "\n"
+            "Clickable element:\n"
+            "  Text: Both\n"
+            "  Description: Both desc\n"
+            "  Bounds: bogus"
+        )
+        assert run.args[1:] == ["-s", "device123", "exec-out", "uiautomator", "dump", "/dev/tty"]
+
+    def test_no_clickable_elements(self, manager, monkeypatch):
+        """Test the message when nothing clickable has text or description"""
+        monkeypatch.setattr("subprocess.run", fake_run(
+            b'<hierarchy rotation="0"><node text="Label" clickable="false" bounds="[0,0][1,1]" /></hierarchy>'))
+
+        assert manager.get_uilayout() == "No clickable elements found with text or description"
+
+    def test_dump_failure_raises(self, manager, monkeypatch):
+        """Test output without a hierarchy raises with uiautomator's message"""
+        monkeypatch.setattr("subprocess.run", fake_run(b"ERROR: could not get idle state.\n"))
+
+        with pytest.raises(RuntimeError, match="uiautomator dump failed: ERROR: could not get idle state."):
+            manager.get_uilayout()
+
+
+class TestScreenshot:
+    """Test take_screenshot downscaling and encoding"""
+
+    @pytest.mark.parametrize("high_quality", [False, True])
+    def test_returns_downscaled_jpeg(self, manager, monkeypatch, high_quality):
+        """Test the screencap PNG comes back as a 0.3x JPEG"""
+        png = io.BytesIO()
+        PILImage.new("RGBA", (1080, 2400), (30, 120, 200, 255)).save(png, "PNG")
+        run = fake_run(png.getvalue())
+        monkeypatch.setattr("subprocess.run", run)
+        manager.high_quality_screenshots = high_quality
+
+        data = manager.take_screenshot()
+
+        assert run.args[1:] == ["-s", "device123", "exec-out", "screencap", "-p"]
+        with PILImage.open(io.BytesIO(data)) as img:
+            assert img.format == "JPEG"
+            assert img.size == (324, 720)